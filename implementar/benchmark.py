@@ -0,0 +1,187 @@
+import argparse
+import csv
+import json
+import platform
+import random
+import sys
+import time
+from typing import Callable, Dict, List
+
+from fda import FDA, CFG
+from compiled_dfa import compile_many
+
+# Geradores de entradas escaláveis
+
+def random_nfa(n: int, alphabet_size: int=2, density: float=0.3, seed: int=0) -> str:
+    '''Autômato não determinístico aleatório no formato de FDA.from_string, com estados q0..q{n-1}.
+    Cada par (estado, símbolo) leva a cada estado com probabilidade density, todo estado tem ao menos uma transição.'''
+    rng = random.Random(seed)
+    states = [f"q{i}" for i in range(n)]
+    alphabet = [chr(ord("a") + i) for i in range(alphabet_size)]
+    transitions = []
+    for state in states:
+        state_transitions = [(state, symbol, other) for symbol in alphabet for other in states if rng.random() < density]
+        if not state_transitions: state_transitions.append((state, rng.choice(alphabet), rng.choice(states)))
+        transitions.extend(state_transitions)
+    final_states = rng.sample(states, max(1, n // 4))
+    transitions = ";".join(",".join(transition) for transition in transitions)
+    return f"{n};{states[0]};{{{','.join(final_states)}}};{{{','.join(alphabet)}}};{transitions}"
+
+def worst_case_regex(k: int) -> str:
+    '''(a|b)*a(a|b){k}, cujo autômato determinístico mínimo tem 2^(k+1) estados.'''
+    return "(a|b)*a" + "(a|b)" * k
+
+def expression_grammar(levels: int, left_recursive: bool=False) -> str:
+    '''Gramática de expressões com um nível de precedência por operador.
+    A versão recursiva à esquerda é E{i} = E{i} op{i} E{i+1} | E{i+1}, a outra é a equivalente LL(1).'''
+    rules = []
+    for i in range(levels):
+        if left_recursive:
+            rules.append(f"E{i} = E{i} op{i} E{i+1};")
+            rules.append(f"E{i} = E{i+1};")
+        else:
+            rules.append(f"E{i} = E{i+1} R{i};")
+            rules.append(f"R{i} = op{i} E{i+1} R{i};")
+            rules.append(f"R{i} = &;")
+    rules.append(f"E{levels} = ( E0 );")
+    rules.append(f"E{levels} = id;")
+    return " ".join(rules)
+
+def random_string(alphabet, length: int, seed: int=0) -> str:
+    rng = random.Random(seed)
+    alphabet = sorted(alphabet)
+    return "".join(rng.choice(alphabet) for _ in range(length))
+
+# Benchmarks: cada um prepara a entrada do tamanho dado e retorna a operação a ser medida
+
+def bench_from_regex(k: int):
+    regex = worst_case_regex(k)
+    return lambda: FDA(regex=regex)
+
+# Em média 2 destinos por (estado, símbolo): densidades fixas saturam os subconjuntos e o determinístico fica pequeno
+def bench_deterministic_equivalent(n: int):
+    nfa = FDA(random_nfa(n, density=2 / n))
+    return nfa.deterministic_equivalent
+
+def bench_minimal_equivalent(n: int):
+    nfa = FDA(random_nfa(n, density=2 / n))
+    return nfa.minimal_equivalent
+
+def bench_compile_many(n: int):
+    patterns = [worst_case_regex(2 + i % 5) for i in range(n)]
+    return lambda: compile_many(patterns)
+
+def bench_extended_compute(length: int):
+    dfa = FDA(regex=worst_case_regex(6))
+    string = random_string(dfa.alphabet, length)
+    def run():
+        dfa.current_state = None
+        return dfa.extended_compute(string)
+    return run
+
+def bench_first_follow(levels: int):
+    cfg = CFG(expression_grammar(levels))
+    return cfg.first_follow
+
+def bench_ll1_parser_table(levels: int):
+    cfg = CFG(expression_grammar(levels))
+    return cfg.ll1_parser_table
+
+def bench_lr_parser_table(levels: int):
+    cfg = CFG(expression_grammar(levels, left_recursive=True))
+    return cfg.lr_parser_table
+
+BENCHMARKS: Dict[str, Callable] = {
+    "from_regex": bench_from_regex,
+    "deterministic_equivalent": bench_deterministic_equivalent,
+    "minimal_equivalent": bench_minimal_equivalent,
+    "compile_many": bench_compile_many,
+    "extended_compute": bench_extended_compute,
+    "first_follow": bench_first_follow,
+    "ll1_parser_table": bench_ll1_parser_table,
+    "lr_parser_table": bench_lr_parser_table,
+}
+
+# Tamanhos de cada varredura: k do regex, estados do NFA, número de padrões, tamanho da entrada e níveis da gramática
+SWEEPS: Dict[str, List[int]] = {
+    "from_regex": [2, 4, 6, 8, 10],
+    "deterministic_equivalent": [8, 16, 32, 64, 128],
+    "minimal_equivalent": [8, 16, 32, 64],
+    "compile_many": [10, 100, 400],
+    "extended_compute": [1000, 10000, 100000],
+    "first_follow": [10, 50, 100, 200],
+    "ll1_parser_table": [10, 50, 100, 200],
+    "lr_parser_table": [10, 50, 100, 200],
+}
+
+QUICK_SWEEPS: Dict[str, List[int]] = {name: sizes[:2] for name, sizes in SWEEPS.items()}
+
+def measure(operation: Callable, repeat: int) -> float:
+    '''Menor tempo entre as repetições, em segundos.'''
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        operation()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run(names: List[str], sweeps: Dict[str, List[int]], repeat: int) -> List[dict]:
+    results = []
+    for name in names:
+        for size in sweeps[name]:
+            operation = BENCHMARKS[name](size)
+            seconds = measure(operation, repeat)
+            results.append({"benchmark": name, "size": size, "seconds": seconds, "repeat": repeat})
+            print(f"{name:<26}{size:>8}{seconds:>14.6f}s", file=sys.stderr)
+    return results
+
+def write_results(results: List[dict], path: str) -> None:
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=["benchmark", "size", "seconds", "repeat"])
+            writer.writeheader()
+            writer.writerows(results)
+        return
+    metadata = {"python": platform.python_version(), "platform": platform.platform(), "time": time.strftime("%Y-%m-%dT%H:%M:%S")}
+    with open(path, "w") as file:
+        json.dump({"metadata": metadata, "results": results}, file, indent=2)
+
+def read_results(path: str) -> List[dict]:
+    if path.endswith(".csv"):
+        with open(path, newline="") as file:
+            return [{**row, "size": int(row["size"]), "seconds": float(row["seconds"])} for row in csv.DictReader(file)]
+    with open(path) as file:
+        return json.load(file)["results"]
+
+def compare(baseline: List[dict], results: List[dict], threshold: float) -> List[str]:
+    '''Lista as medições que ficaram mais de threshold vezes mais lentas que no arquivo de referência.'''
+    reference = {(result["benchmark"], result["size"]): result["seconds"] for result in baseline}
+    regressions = []
+    for result in results:
+        key = (result["benchmark"], result["size"])
+        if key not in reference or reference[key] <= 0: continue
+        ratio = result["seconds"] / reference[key]
+        if ratio > threshold:
+            regressions.append(f"{result['benchmark']}[{result['size']}]: {reference[key]:.6f}s -> {result['seconds']:.6f}s ({ratio:.2f}x)")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mede o tempo dos algoritmos de autômatos e gramáticas para entradas de tamanho crescente.")
+    parser.add_argument("benchmarks", nargs="*", help=f"benchmarks a executar (padrão: todos): {', '.join(BENCHMARKS)}")
+    parser.add_argument("-o", "--output", default="benchmark.json", help="arquivo de saída, .json ou .csv")
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    parser.add_argument("--quick", action="store_true", help="executa só os menores tamanhos de cada varredura")
+    parser.add_argument("--compare", help="resultados de uma versão anterior para detectar regressões")
+    parser.add_argument("--threshold", type=float, default=1.25, help="razão de tempo a partir da qual uma medição é regressão")
+    args = parser.parse_args()
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown: parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    results = run(args.benchmarks or list(BENCHMARKS), QUICK_SWEEPS if args.quick else SWEEPS, args.repeat)
+    write_results(results, args.output)
+
+    if args.compare:
+        regressions = compare(read_results(args.compare), results, args.threshold)
+        for regression in regressions: print(regression)
+        if regressions: sys.exit(1)
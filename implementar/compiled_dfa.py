@@ -0,0 +1,217 @@
+import mmap
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Sequence, Union
+
+from fda import FDA
+
+Buffer = Union[str, bytes, bytearray, memoryview]
+
+# Pedaços de arquivo lidos por cada tarefa de scan_file, limita a memória usada por processo
+FILE_CHUNK_SIZE = 64 * 1024 * 1024
+
+class CompiledDFA:
+    '''Forma compacta de um autômato determinístico, para enviar entre processos e executar.
+
+    Os estados são inteiros 0..n-1 numerados em largura a partir do estado inicial (0).
+    table[state * len(alphabet) + column] é o destino, ou -1 quando não há transição, finals[state] é 1 nos estados de aceitação.'''
+
+    def __init__(self, alphabet: Sequence[str], table: array, start: int, finals: bytes) -> None:
+        self.alphabet = tuple(alphabet)
+        self.table = table
+        self.start = start
+        self.finals = finals
+        self.symbol_index = {symbol: column for column, symbol in enumerate(self.alphabet)}
+        # Tabela de bytes.translate: cada byte vira o número da sua coluna, len(alphabet) fora do alfabeto
+        width = len(self.alphabet)
+        self.byte_columns = bytes(self.symbol_index.get(chr(byte), width) for byte in range(256)) if width < 256 else None
+
+    def __reduce__(self):
+        return (CompiledDFA, (self.alphabet, self.table, self.start, self.finals))
+
+    @property
+    def num_states(self) -> int:
+        return len(self.finals)
+
+    @classmethod
+    def from_fda(cls, fda: FDA) -> 'CompiledDFA':
+        if not fda.is_deterministic(): fda = fda.deterministic_equivalent()
+        alphabet = sorted(fda.alphabet)
+        width = len(alphabet)
+        if fda.initial_state is None: return cls(alphabet, array("i"), -1, b"")
+
+        numbers = {fda.initial_state: 0}
+        order = [fda.initial_state]
+        table = array("i")
+        for state in order:
+            row = [-1] * width
+            transitions = fda.transitions.get(state, {})
+            for column, symbol in enumerate(alphabet):
+                if symbol not in transitions or not transitions[symbol]: continue
+                next_state = min(transitions[symbol])
+                if next_state not in numbers:
+                    numbers[next_state] = len(order)
+                    order.append(next_state)
+                row[column] = numbers[next_state]
+            table.extend(row)
+        finals = bytes(state in fda.final_states for state in order)
+        return cls(alphabet, table, 0, finals)
+
+    def accepts(self, string: Iterable[str]) -> bool:
+        state = self.start
+        width = len(self.alphabet)
+        table = self.table
+        symbol_index = self.symbol_index
+        for symbol in string:
+            if state < 0: return False
+            column = symbol_index.get(symbol)
+            if column is None: return False
+            state = table[state * width + column]
+        return state >= 0 and self.finals[state] == 1
+
+    def columns(self, data: Buffer) -> Iterable[int]:
+        '''Colunas da tabela para cada símbolo da entrada, símbolos fora do alfabeto viram a coluna len(alphabet).'''
+        width = len(self.alphabet)
+        if isinstance(data, str): return (self.symbol_index.get(symbol, width) for symbol in data)
+        # bytes.translate converte a entrada toda em C
+        if self.byte_columns is not None: return bytes(data).translate(self.byte_columns)
+        return (self.symbol_index.get(chr(byte), width) for byte in bytes(data))
+
+    def transfer(self, columns: Iterable[int], starts: Sequence[int]=None) -> List[int]:
+        '''Função de transferência de um pedaço da entrada: o estado final para cada estado de partida em starts (todos, por padrão), -1 se morrer.
+        Os estados que se encontram no mesmo estado são fundidos, então o custo cai para o de uma única simulação assim que todos convergem.'''
+        width = len(self.alphabet)
+        table = self.table
+        if starts is None: starts = range(self.num_states)
+        current = list(dict.fromkeys(state for state in starts if state >= 0))
+        position = {state: i for i, state in enumerate(current)}
+        # starts[i] está agora em current[slots[i]], -1 quando morreu
+        slots = [position.get(state, -1) for state in starts]
+        columns = iter(columns)
+        while len(current) > 1:
+            column = next(columns, None)
+            if column is None: break
+            moved = [table[state * width + column] for state in current] if column < width else []
+            if len(moved) == len(current) and -1 not in moved and len(set(moved)) == len(moved):
+                current = moved
+                continue
+            position = {}
+            remap = []
+            current = []
+            for state in moved:
+                if state < 0:
+                    remap.append(-1)
+                    continue
+                if state not in position:
+                    position[state] = len(current)
+                    current.append(state)
+                remap.append(position[state])
+            slots = [remap[slot] if slot >= 0 and remap else -1 for slot in slots]
+
+        if len(current) == 1:
+            state = current[0]
+            for column in columns:
+                if column >= width:
+                    state = -1
+                    break
+                state = table[state * width + column]
+                if state < 0: break
+            if state < 0: slots = [-1] * len(slots)
+            current = [state]
+        return [current[slot] if slot >= 0 else -1 for slot in slots]
+
+    def stitch(self, transfers: List[List[int]]) -> bool:
+        '''Compõe as funções de transferência dos pedaços, a do primeiro pedaço parte só do estado inicial.'''
+        state = transfers[0][0]
+        for transfer in transfers[1:]:
+            if state < 0: return False
+            state = transfer[state]
+        return state >= 0 and self.finals[state] == 1
+
+    def advance(self, buffer: Buffer, state: int) -> int:
+        '''Estado alcançado lendo buffer a partir de state, -1 se o autômato morrer.'''
+        return self.transfer(self.columns(buffer), [state])[0]
+
+    def scan(self, buffer: Buffer) -> bool:
+        return self.stitch([[self.advance(buffer, self.start)]])
+
+    def scan_many(self, buffers: Iterable[Buffer]) -> List[bool]:
+        '''Executa várias entradas pequenas em uma única passada, com as tabelas em variáveis locais.'''
+        width = len(self.alphabet)
+        table = self.table
+        finals = self.finals
+        results = []
+        for buffer in buffers:
+            state = self.start
+            for column in self.columns(buffer):
+                if state < 0 or column >= width:
+                    state = -1
+                    break
+                state = table[state * width + column]
+            results.append(state >= 0 and finals[state] == 1)
+        return results
+
+    def scan_parallel(self, buffer: Buffer, workers: int=None, chunk_size: int=None) -> bool:
+        '''Verifica se o autômato aceita buffer dividindo a entrada em pedaços processados em paralelo.
+        Cada pedaço, exceto o primeiro, é executado a partir de todos os estados e as funções de transferência são compostas em ordem.'''
+        workers = workers or os.cpu_count() or 1
+        chunk_size = chunk_size or max(1, -(-len(buffer) // workers))
+        bounds = [(start, min(start + chunk_size, len(buffer))) for start in range(0, len(buffer), chunk_size)]
+        if workers == 1 or len(bounds) < 2: return self.scan(buffer)
+        with ProcessPoolExecutor(max_workers=workers, initializer=set_worker_dfa, initargs=(self,)) as executor:
+            # Fatias de memoryview não são serializáveis, os pedaços de entradas binárias são enviados como bytes
+            binary = not isinstance(buffer, str)
+            chunks = [bytes(buffer[start:end]) if binary else buffer[start:end] for start, end in bounds]
+            futures = [executor.submit(chunk_transfer, chunk, [self.start] if i == 0 else None) for i, chunk in enumerate(chunks)]
+            return self.stitch([future.result() for future in futures])
+
+    def scan_file(self, path: str, workers: int=None, chunk_size: int=None) -> bool:
+        '''Como scan_parallel, mas cada processo lê o seu pedaço do arquivo com mmap em vez de recebê-lo do processo principal.'''
+        size = os.path.getsize(path)
+        if size == 0: return self.scan(b"")
+        workers = workers or os.cpu_count() or 1
+        chunk_size = chunk_size or min(FILE_CHUNK_SIZE, max(1, -(-size // workers)))
+        bounds = [(start, min(start + chunk_size, size)) for start in range(0, size, chunk_size)]
+        if workers == 1:
+            # Sequencialmente basta levar um único estado de um pedaço para o outro
+            state = self.start
+            for start, end in bounds:
+                if state < 0: break
+                state = self.advance(read_file_chunk(path, start, end), state)
+            return state >= 0 and self.finals[state] == 1
+        with ProcessPoolExecutor(max_workers=workers, initializer=set_worker_dfa, initargs=(self,)) as executor:
+            futures = [executor.submit(file_chunk_transfer, path, start, end, [self.start] if i == 0 else None) for i, (start, end) in enumerate(bounds)]
+            return self.stitch([future.result() for future in futures])
+
+# Autômato de cada processo do pool, enviado uma vez pelo initializer em vez de a cada tarefa
+worker_dfa: CompiledDFA = None
+
+def set_worker_dfa(dfa: CompiledDFA) -> None:
+    global worker_dfa
+    worker_dfa = dfa
+
+def chunk_transfer(data: Buffer, starts: Sequence[int]=None) -> List[int]:
+    return worker_dfa.transfer(worker_dfa.columns(data), starts)
+
+def read_file_chunk(path: str, start: int, end: int) -> bytes:
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        return data[start:end]
+
+def file_chunk_transfer(path: str, start: int, end: int, starts: Sequence[int]=None) -> List[int]:
+    return chunk_transfer(read_file_chunk(path, start, end), starts)
+
+def compile_pattern(pattern: str) -> CompiledDFA:
+    '''Autômato mínimo de uma expressão regular, na forma compacta.'''
+    return CompiledDFA.from_fda(FDA(regex=pattern).minimal_equivalent())
+
+def compile_many(patterns: Iterable[str], workers: int=None, chunksize: int=None) -> List[CompiledDFA]:
+    '''Compila várias expressões regulares independentes em um pool de processos, mantendo a ordem da entrada.
+    Os processos devolvem CompiledDFA, que é serializado como um array e uma string de bytes em vez dos frozensets de um FDA.'''
+    patterns = list(patterns)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(patterns) < 2: return [compile_pattern(pattern) for pattern in patterns]
+    # Lotes grandes o bastante para amortizar a comunicação, mas em número suficiente para balancear a carga entre os processos
+    chunksize = chunksize or max(1, len(patterns) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(compile_pattern, patterns, chunksize=chunksize))
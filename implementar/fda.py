@@ -1,5 +1,7 @@
-from typing import Dict, FrozenSet, Set, List
+from typing import Dict, FrozenSet, Set, List, Tuple
 import regex_parser
+import lr_table
+import instrumentation
 
 State = FrozenSet[str]
 
@@ -23,9 +25,11 @@ class FDA:
         if self.current_state not in self.transitions or symbol not in self.transitions[self.current_state]:
             self.current_state = 'qm'
             return
-        self.current_state = self.transitions[self.current_state][symbol]
+        # A tabela guarda o conjunto de destinos, um autômato determinístico tem um único destino por símbolo
+        self.current_state = min(self.transitions[self.current_state][symbol])
 
     def extended_compute(self, string: str) -> bool:
+        if self.current_state is None: self.current_state = self.initial_state
         for symbol in string: self.compute(symbol)
         return self.current_state in self.final_states
 
@@ -33,8 +37,8 @@ class FDA:
         temp_states = set()
         num_states, initial_state, final_states, alphabet, *transitions = self.string.split(';')
         self.num_states = int(num_states)
-        self.initial_state = frozenset(initial_state)
-        self.final_states = frozenset(frozenset(state) for state in final_states[1:-1].split(','))
+        self.initial_state = frozenset((initial_state,))
+        self.final_states = frozenset(frozenset((state,)) for state in final_states[1:-1].split(','))
         self.alphabet = frozenset(alphabet[1:-1].split(','))
         transitions = [transition for transition in transitions if transition]
         for transition in transitions:
@@ -49,40 +53,49 @@ class FDA:
             temp_states.update(self.transitions[state][symbol])
         self.states = frozenset(temp_states)
     
+    @instrumentation.instrumented
     def from_regex(self) -> None: 
-        root = regex_parser.CatRegexNode(left=regex_parser.parse_regex(self.regex), right=regex_parser.LeafRegexNode("#"))
-        n_leaves, leaf_symbol = root.name_leaves()
-        followpos_table = {}
-        for i in range(1, n_leaves+1): followpos_table[str(i)] = set()
-        followpos = root.followpos(followpos_table)
-        firstpos = root.firstpos
-
-        # Turn all of these sets to frozensets
-        for key in followpos: followpos[key] = frozenset(followpos[key])
-        firstpos = frozenset(firstpos)
+        with instrumentation.phase("followpos"):
+            root = regex_parser.CatRegexNode(left=regex_parser.parse_regex(self.regex), right=regex_parser.LeafRegexNode("#"))
+            leaf_symbol, followpos = regex_parser.annotate(root)
+            n_leaves = len(leaf_symbol) - 1
+            instrumentation.count("leaves", n_leaves)
+            # Percorre todo o followpos, só é calculado com a instrumentação ligada
+            if instrumentation.listeners: instrumentation.count("followpos_size", sum(positions.bit_count() for positions in followpos))
 
         self.alphabet = frozenset([symbol for symbol in self.regex if symbol.isalpha() or symbol.isnumeric()])
-        self.initial_state = frozenset(firstpos)
 
+        # Durante a construção os estados são bitmasks de posições, convertidos uma única vez para o conjunto dos números das folhas
+        names: Dict[int, State] = {}
+        def name(positions: int) -> State:
+            if positions not in names: names[positions] = frozenset(str(i) for i in regex_parser.positions(positions))
+            return names[positions]
+
+        self.initial_state = name(root.firstpos)
         self.transitions = {}
-        stack = [firstpos]
+        visited = {root.firstpos}
+        stack = [root.firstpos]
         while stack:
             current_state = stack.pop()
-            if current_state not in self.transitions: self.transitions[current_state] = {}
-            for symbol in self.alphabet:
-                next_state = frozenset()
-                for state in current_state:
-                    if state not in followpos: continue
-                    if symbol == leaf_symbol[state]:
-                        next_state = next_state.union(followpos[state])
+            # Agrupa as posições do estado pelo símbolo da folha em uma única passada
+            next_states: Dict[str, int] = {}
+            for position in regex_parser.positions(current_state):
+                symbol = leaf_symbol[position]
+                if symbol not in self.alphabet: continue
+                next_states[symbol] = next_states.get(symbol, 0) | followpos[position]
+
+            transitions = self.transitions[name(current_state)] = {}
+            for symbol, next_state in next_states.items():
                 if not next_state: continue
-                if next_state not in self.transitions[current_state]: self.transitions[current_state][symbol] = frozenset()
-                self.transitions[current_state][symbol] = self.transitions[current_state][symbol].union(frozenset((next_state,)))
-                if next_state not in self.transitions: stack.append(next_state)
+                transitions[symbol] = frozenset((name(next_state),))
+                if next_state not in visited:
+                    visited.add(next_state)
+                    stack.append(next_state)
 
         self.states = frozenset(self.transitions.keys())
-        self.final_states = frozenset([state for state in self.states if str(n_leaves) in state])
+        self.final_states = frozenset([name(state) for state in visited if state >> n_leaves & 1])
         self.num_states = len(self.states)
+        instrumentation.count("states", self.num_states)
         self.string = str(self)
         return self
 
@@ -110,6 +123,7 @@ class FDA:
 
         return f"{num_states};{initial_state};{{{final_states}}};{{{alphabet}}};{transitions}"
 
+    @instrumentation.instrumented
     def deterministic_equivalent(self) -> 'FDA':
         def epsilon_closure(state: State, closure: set=None) -> State:
             '''Retorna o ε* de um estado, realizando uma busca em profundidade.'''
@@ -124,7 +138,9 @@ class FDA:
             return frozenset(closure)
 
         # Se o autômato já é determinístico, retorna uma cópia dele mesmo
-        if self.is_deterministic(): return self.copy()
+        if self.is_deterministic():
+            instrumentation.count("states", self.num_states)
+            return self.copy()
 
         deterministic = FDA()
         # Trata todo autômato não determinístico como se tivesse transições por ε
@@ -179,8 +195,10 @@ class FDA:
                     break
 
         deterministic.string = str(deterministic)
+        instrumentation.count("states", deterministic.num_states)
         return deterministic
 
+    @instrumentation.instrumented
     def equivalent_states(self) -> Dict[State, State]:
         def are_equivalent(state: State, other_state: State, previous_classes: List[FrozenSet[State]]) -> bool:
             '''Verifica se dois estados são n_equivalentes, ou seja, se para toda transição, o estado destino pertence à mesma classe de equivalência n-1.'''
@@ -220,7 +238,9 @@ class FDA:
 
         current_equivalence: List[FrozenSet[State]] = [self.final_states, self.states.difference(self.final_states)]
         next_equivalence: List[FrozenSet[State]] = []
+        rounds = 0
         while True:
+            rounds += 1
             for equivalence_class in current_equivalence:
                 temp_equivalence: List[FrozenSet[State]] = []
                 for state in equivalence_class:
@@ -244,6 +264,8 @@ class FDA:
             else:
                 current_equivalence, next_equivalence = next_equivalence, []
 
+        instrumentation.count("refinement_rounds", rounds)
+        instrumentation.count("classes", len(current_equivalence))
         equivalent = {}
         for state in self.states:
             find = None
@@ -253,6 +275,7 @@ class FDA:
             equivalent[state] = find
         return equivalent
     
+    @instrumentation.instrumented
     def minimal_equivalent(self) -> 'FDA':
         # Determiniza, remove estados inalcançáveis e mortos
         clean = self.deterministic_equivalent().remove_unreachable_states().remove_dead_states()
@@ -279,8 +302,10 @@ class FDA:
 
         minimal.num_states = len(minimal.states)
         minimal.string = str(minimal)
+        instrumentation.count("states", minimal.num_states)
         return minimal
 
+    @instrumentation.instrumented
     def remove_unreachable_states(self) -> 'FDA':
         '''Busca em profundidade a partir do estado inicial, estados não alcançados são inalcançáveis'''
         reachable_states = set()
@@ -295,6 +320,7 @@ class FDA:
                     if next_state not in reachable_states:
                         stack.append(next_state)
         unreachable_states = self.states.difference(reachable_states)
+        instrumentation.count("pruned", len(unreachable_states))
 
         # Remove as transições que envolvem os estados inalcançáveis
         self.remove_states_transitions(unreachable_states)
@@ -304,6 +330,7 @@ class FDA:
         self.string = str(self)
         return self
     
+    @instrumentation.instrumented
     def remove_dead_states(self) -> 'FDA':
         '''Busca reversa a partir dos estados de aceitação, estados que não são alcançados são considerados mortos.'''
         dead_states = set(self.states.difference(self.final_states))
@@ -318,6 +345,7 @@ class FDA:
                         stack.append(other_state)
                         break
         
+        instrumentation.count("pruned", len(dead_states))
         self.remove_states_transitions(dead_states)
 
         self.states = self.states.difference(dead_states)
@@ -367,88 +395,141 @@ class FDA:
         transitions.sort(key=lambda x: sorted(x[0])) # Ordena as transições pelo estado de origem
         return transitions
 
+def symbol_order(symbol: str):
+    '''Sort key used in the outputs: alphabetic symbols first, then the remaining ones.'''
+    return (not symbol[:1].isalpha(), symbol)
+
 class CFG:
     def __init__(self, string: str) -> None:
-        self.rules: Dict[str, List[str]] = {}
         self.rules_order: List[str] = []
         self.first: Dict[str, Set[str]] = {}
         self.follow: Dict[str, Set[str]] = {}
         self.string = string
         self.start: str = ""
+        # Symbol table: every grammar symbol is interned as an int id
+        self.symbols: List[str] = []
+        self.symbol_ids: Dict[str, int] = {}
+        self.nonterminals: Set[int] = set()
+        # Productions as (head, body) pairs, the rule id of a production is its index + 1
+        self.productions: List[Tuple[int, Tuple[int, ...]]] = []
+        # Production indexes of each head and (production, position) occurrences of each symbol in the bodies
+        self.head_productions: Dict[int, List[int]] = {}
+        self.occurrences: Dict[int, List[Tuple[int, int]]] = {}
+        self.first_ids: Dict[int, Set[int]] = {}
+        self.follow_ids: Dict[int, Set[int]] = {}
+        self.epsilon: int = self.intern("&")
+        self.end: int = self.intern("$")
         self.from_string()
         self.first_follow()
 
+    def intern(self, symbol: str) -> int:
+        if symbol not in self.symbol_ids:
+            self.symbol_ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return self.symbol_ids[symbol]
+
+    @staticmethod
+    def tokenize(body: str, named: bool) -> List[str]:
+        '''Named grammars separate symbols by whitespace ("expr = term expr_tail"), otherwise each character is a symbol ("E = TA").'''
+        symbols = body.split() if named else list(body)
+        return [symbol for symbol in symbols if symbol != "&"]
+
     def from_string(self) -> None:
-        for i, rule in enumerate(self.string.split(';')[:-1]):
-            left, right = rule.split('=')
-            left, right = left.strip(), right.strip()
+        rules = [rule.split('=') for rule in self.string.split(';')[:-1]]
+        rules = [(left.strip(), right.strip()) for left, right in rules]
+        # A grammar is written with named symbols when any of its bodies has whitespace or a head is longer than one character
+        named = any(len(left) > 1 or any(character.isspace() for character in right) for left, right in rules)
+
+        bodies: Dict[str, List[List[str]]] = {}
+        for i, (left, right) in enumerate(rules):
             if i == 0: self.start = left
 
-            if left not in self.rules:
-                self.rules[left] = []
+            if left not in bodies:
+                bodies[left] = []
                 self.rules_order.append(left)
-            self.rules[left].append(right)
-
-    def first_follow(self) -> None:
-        # First
-        for rule in self.rules_order[::-1]:
-            if self.first.get(rule) is None: self.first[rule] = set()
-            self.first[rule].update(self.body_first(rule))
+            bodies[left].append(self.tokenize(right, named))
 
-        # Follow
-        self.follow[self.start] = {"$"}
+        # Heads are interned first so that nonterminals are known before reading the bodies
+        for rule in self.rules_order: self.nonterminals.add(self.intern(rule))
         for rule in self.rules_order:
-            if self.follow.get(rule) is None: self.follow[rule] = set()
-            self.follow[rule].update(self.head_follow(rule))
+            for body in bodies[rule]:
+                self.add_production(self.symbol_ids[rule], tuple(self.intern(symbol) for symbol in body))
 
-    def body_first(self, body: str, visited=None) -> Set[str]:
-        if visited is None: visited = set()
-        first = set()
-        for symbol in body:
-            if symbol == "&": return first.union({"&"})
-            if not symbol.isupper(): return first.union({symbol})
-            if symbol in visited: continue
+    def add_production(self, head: int, body: Tuple[int, ...]) -> int:
+        index = len(self.productions)
+        self.productions.append((head, body))
+        self.head_productions.setdefault(head, []).append(index)
+        for position, symbol in enumerate(body):
+            self.occurrences.setdefault(symbol, []).append((index, position))
+        return index
 
-            visited.add(symbol)
-            if self.first.get(symbol) and "&" not in self.first[symbol]: return first.union(self.first[symbol]) 
-            other_bodies = self.rules[symbol] if self.rules.get(symbol) is not None else []
-            for other_body in other_bodies:
-                first.update(self.body_first(other_body, visited))
+    def names(self, symbols) -> Set[str]:
+        return {self.symbols[symbol] for symbol in symbols}
 
+    def first_follow(self) -> None:
+        self.compute_first()
+        self.compute_follow()
+        self.first = {rule: self.names(self.first_ids[self.symbol_ids[rule]]) for rule in self.rules_order}
+        self.follow = {rule: self.names(self.follow_ids[self.symbol_ids[rule]]) for rule in self.rules_order}
+
+    def compute_first(self) -> None:
+        self.first_ids = {head: set() for head in self.nonterminals}
+        # Worklist of heads whose FIRST must be recomputed, a head is queued again when FIRST of a symbol in its bodies grows
+        pending = list(self.nonterminals)
+        queued = set(pending)
+        while pending:
+            head = pending.pop()
+            queued.discard(head)
+            first = self.first_ids[head]
+            size = len(first)
+            for index in self.head_productions.get(head, []):
+                first.update(self.sequence_first(self.productions[index][1]))
+            if len(first) == size: continue
+            for index, _ in self.occurrences.get(head, []):
+                other_head = self.productions[index][0]
+                if other_head not in queued:
+                    queued.add(other_head)
+                    pending.append(other_head)
+
+    def compute_follow(self) -> None:
+        self.follow_ids = {head: set() for head in self.nonterminals}
+        self.follow_ids[self.symbol_ids[self.start]].add(self.end)
+        # inherits[A] holds the nonterminals B such that FOLLOW(A) is contained in FOLLOW(B)
+        inherits: Dict[int, Set[int]] = {head: set() for head in self.nonterminals}
+        for symbol in self.nonterminals:
+            for index, position in self.occurrences.get(symbol, []):
+                head, body = self.productions[index]
+                rest_first = self.sequence_first(body, position + 1)
+                if self.epsilon in rest_first:
+                    rest_first.discard(self.epsilon)
+                    if head != symbol: inherits[head].add(symbol)
+                self.follow_ids[symbol].update(rest_first)
+
+        pending = list(self.nonterminals)
+        while pending:
+            head = pending.pop()
+            for symbol in inherits[head]:
+                size = len(self.follow_ids[symbol])
+                self.follow_ids[symbol].update(self.follow_ids[head])
+                if len(self.follow_ids[symbol]) != size: pending.append(symbol)
+
+    def sequence_first(self, body: Tuple[int, ...], start: int=0) -> Set[int]:
+        '''FIRST of body[start:], containing ε when the whole sequence is nullable.'''
+        first = set()
+        for i in range(start, len(body)):
+            symbol = body[i]
+            if symbol not in self.nonterminals:
+                first.discard(self.epsilon)
+                first.add(symbol)
+                return first
+            symbol_first = self.first_ids[symbol]
+            first.update(symbol_first)
+            if self.epsilon not in symbol_first:
+                first.discard(self.epsilon)
+                return first
+        first.add(self.epsilon)
         return first
 
-    def head_follow(self, rule: str) -> Set[str]:
-        follow = set()
-        for other_rule in self.rules:
-            for body in self.rules[other_rule]:
-                # Check if non-terminal is in the body of this other rule and store its index
-                try: index = body.index(rule)
-                except ValueError: continue
-                while True:
-                    if index == len(body) - 1:
-                        tmp = self.follow[other_rule] if self.follow.get(other_rule) is not None else self.head_follow(other_rule)
-                        follow.update(tmp)
-                        break
-                    elif not body[index+1].isupper():
-                        follow.update(body[index+1])
-                        break
-                    else:
-                        rule_first = self.first[body[index+1]]
-                        follow.update(rule_first)
-                        if "&" not in rule_first: break
-                        index += 1
-        if "&" in follow: follow.remove("&")
-        return follow
-
-    def get_rule_id(self, variable: str, body: str) -> int:
-        id = 1
-        for rule in self.rules_order:
-            for b in self.rules[rule]:
-                if rule == variable and b == body:
-                    return id
-                id += 1
-        raise ValueError("Rule not found")
-
     def is_ll1(self):
         if self.is_left_recursive():
             print("Recursão à esquerda")
@@ -459,69 +540,254 @@ class CFG:
         return True
     
     def is_left_recursive(self) -> bool:
-        return any([self.is_rule_recursive(rule) for rule in self.rules_order])
+        return bool(self.left_recursive_components())
+
+    def left_recursive_components(self) -> List[Set[int]]:
+        '''Strongly connected components of the "can start with" graph that contain a cycle, i.e. the groups of mutually left-recursive nonterminals.'''
+        graph = self.can_start_with_graph()
+        return [component for component in self.strongly_connected_components(graph)
+                if len(component) > 1 or any(node in graph[node] for node in component)]
+
+    def can_start_with_graph(self) -> Dict[int, Set[int]]:
+        '''Edge A -> B when some body of A is αBβ with α nullable.'''
+        graph = {head: set() for head in self.nonterminals}
+        for head, body in self.productions:
+            for symbol in body:
+                if symbol not in self.nonterminals: break
+                graph[head].add(symbol)
+                if self.epsilon not in self.first_ids[symbol]: break
+        return graph
 
-    def is_rule_recursive(self, rule: str) -> bool:
-        return any([self.body_starts_with_rule(rule, body) for body in self.rules[rule]])
-    
-    def body_starts_with_rule(self, rule: str, body: str, visited=None) -> bool:
-        if visited is None: visited = set()
-        for symbol in body:
-            if symbol == "&": return False
-            if not symbol.isupper(): return False
-            if symbol == rule:
-                print(rule, body)
-                return True
-            if symbol in visited: continue
-            visited.add(symbol)
-            for other_body in self.rules[symbol]:
-                if self.body_starts_with_rule(rule, other_body, visited):
-                    print(rule, body)
-                    return True
-            if "&" not in self.first[symbol]: return False
-        return False
+    @staticmethod
+    def strongly_connected_components(graph: Dict[int, Set[int]]) -> List[Set[int]]:
+        '''Iterative Tarjan, components are returned in reverse topological order.'''
+        index: Dict[int, int] = {}
+        lowlink: Dict[int, int] = {}
+        stack: List[int] = []
+        on_stack: Set[int] = set()
+        components: List[Set[int]] = []
+        for root in graph:
+            if root in index: continue
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(graph[root]))]
+            while work:
+                node, children = work[-1]
+                for child in children:
+                    if child not in index:
+                        index[child] = lowlink[child] = len(index)
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(graph[child])))
+                        break
+                    if child in on_stack: lowlink[node] = min(lowlink[node], index[child])
+                else:
+                    work.pop()
+                    if work: lowlink[work[-1][0]] = min(lowlink[work[-1][0]], lowlink[node])
+                    if lowlink[node] != index[node]: continue
+                    component = set()
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.add(member)
+                        if member == node: break
+                    components.append(component)
+        return components
+
+    def rule_bodies(self) -> Dict[str, List[Tuple[str, ...]]]:
+        return {rule: [tuple(self.symbols[symbol] for symbol in self.productions[index][1]) for index in self.head_productions[self.symbol_ids[rule]]]
+                for rule in self.rules_order}
+
+    @staticmethod
+    def fresh_name(rule: str, used: Set[str]) -> str:
+        name = rule + "'"
+        while name in used: name += "'"
+        used.add(name)
+        return name
+
+    @staticmethod
+    def grammar_string(order: List[str], rules: Dict[str, List[Tuple[str, ...]]]) -> str:
+        named = any(len(symbol) > 1 for rule in order for symbol in (rule, *[symbol for body in rules[rule] for symbol in body]))
+        separator = " " if named else ""
+        return " ".join(f"{rule} = {separator.join(body) if body else '&'};" for rule in order for body in rules[rule])
+
+    def eliminate_left_recursion(self) -> 'CFG':
+        '''Returns an equivalent grammar without left recursion.
+        Only the nonterminals of left-recursive components are rewritten: A -> Bγ is expanded for the B of the same component
+        that come before A, then the immediate recursion A -> Aα | β becomes A -> βA', A' -> αA' | &.
+        When nullable symbols keep some recursion (A -> NAα with N =>* &) the grammar is made &-free first and rewritten again.'''
+        # Unproductive nonterminals have no non-recursive body to start A -> βA' from, they are dropped with every body that uses them
+        productive = self.productive_nonterminals()
+        if self.symbol_ids[self.start] not in productive: raise ValueError("The start symbol doesn't derive any string")
+        unproductive = {self.symbols[head] for head in self.nonterminals - productive}
+        rules = {rule: [body for body in bodies if not unproductive.intersection(body)] for rule, bodies in self.rule_bodies().items() if rule not in unproductive}
+        order = [rule for rule in self.rules_order if rule not in unproductive]
+        used = set(self.symbols)
+        for component in self.left_recursive_components():
+            component = component & productive
+            members = [rule for rule in self.rules_order if self.symbol_ids[rule] in component]
+            for i, rule in enumerate(members):
+                for previous in members[:i]:
+                    expanded = []
+                    for body in rules[rule]:
+                        if body and body[0] == previous: expanded.extend(other + body[1:] for other in rules[previous])
+                        else: expanded.append(body)
+                    rules[rule] = expanded
+
+                recursive = [body[1:] for body in rules[rule] if body and body[0] == rule]
+                if not recursive: continue
+                if len(recursive) == len(rules[rule]): return self.eliminate_left_recursion_from_proper_grammar()
+                tail = self.fresh_name(rule, used)
+                # A -> A bodies add nothing to the language and are dropped
+                rules[tail] = [body + (tail,) for body in recursive if body] + [()]
+                rules[rule] = [body + (tail,) for body in rules[rule] if not body or body[0] != rule]
+                order.insert(order.index(rule) + 1, tail)
+
+        grammar = CFG(self.grammar_string(order, rules))
+        if grammar.is_left_recursive(): return self.eliminate_left_recursion_from_proper_grammar()
+        return grammar
+
+    def eliminate_left_recursion_from_proper_grammar(self) -> 'CFG':
+        '''Retries eliminate_left_recursion after removing the & productions (but S' -> S | &) and the unit productions A -> B.'''
+        nullable = {head for head in self.nonterminals if self.epsilon in self.first_ids[head] and any(head in body for _, body in self.productions)}
+        units = any(len(body) == 1 and body[0] in self.nonterminals for _, body in self.productions)
+        # A grammar that is already proper can't get any simpler
+        if not nullable and not units: raise ValueError("Left recursion can't be eliminated")
+        grammar = self.remove_epsilon_productions(nullable) if nullable else self
+        return grammar.remove_unit_productions().eliminate_left_recursion()
+
+    def remove_epsilon_productions(self, heads: Set[int]) -> 'CFG':
+        '''Equivalent grammar where the nonterminals in heads (nullable ones) don't derive &, heads must include every nullable symbol of their bodies.
+        Every body gets a copy without each combination of their occurrences, a new start symbol keeps & in the language.'''
+        heads = {self.symbols[head] for head in heads}
+        rules = {}
+        for rule, bodies in self.rule_bodies().items():
+            variants = []
+            for body in bodies:
+                options = [()]
+                for symbol in body:
+                    options = [option + (symbol,) for option in options] + (options if symbol in heads else [])
+                variants.extend(option for option in options if option or rule not in heads)
+            rules[rule] = list(dict.fromkeys(variants))
+        order = list(self.rules_order)
+        if self.start in heads:
+            start = self.fresh_name(self.start, set(self.symbols))
+            rules[start] = [(self.start,), ()]
+            order.insert(0, start)
+        return CFG(self.grammar_string(self.drop_empty_rules(order, rules), rules))
+
+    def remove_unit_productions(self) -> 'CFG':
+        '''Equivalent grammar without bodies made of a single nonterminal: A -> B is replaced by the other bodies of B.'''
+        bodies = self.rule_bodies()
+        rules = {}
+        for rule in self.rules_order:
+            reached = [rule]
+            for other in reached:
+                for body in bodies[other]:
+                    if len(body) == 1 and body[0] in bodies and body[0] not in reached: reached.append(body[0])
+            rules[rule] = list(dict.fromkeys(body for other in reached for body in bodies[other] if len(body) != 1 or body[0] not in bodies))
+        return CFG(self.grammar_string(self.drop_empty_rules(list(self.rules_order), rules), rules))
+
+    @staticmethod
+    def drop_empty_rules(order: List[str], rules: Dict[str, List[Tuple[str, ...]]]) -> List[str]:
+        '''Nonterminals left without bodies derive nothing, neither do the bodies that use them. Returns the order without them.'''
+        empty = {rule for rule in order if not rules[rule]}
+        while empty:
+            order = [rule for rule in order if rule not in empty]
+            for rule in order: rules[rule] = [body for body in rules[rule] if not empty.intersection(body)]
+            empty = {rule for rule in order if not rules[rule]}
+        return order
+
+    def productive_nonterminals(self) -> Set[int]:
+        '''Nonterminals that derive some string of terminals.'''
+        productive = set()
+        changed = True
+        while changed:
+            changed = False
+            for head, body in self.productions:
+                if head in productive: continue
+                if all(symbol in productive or symbol not in self.nonterminals for symbol in body):
+                    productive.add(head)
+                    changed = True
+        return productive
+
+    def left_factor(self) -> 'CFG':
+        '''Returns an equivalent grammar where no two bodies of a nonterminal start with the same symbol: A -> αβ | αγ becomes A -> αA', A' -> β | γ.'''
+        rules = self.rule_bodies()
+        order = list(self.rules_order)
+        used = set(self.symbols)
+        i = 0
+        while i < len(order):
+            rule = order[i]
+            # Repeated bodies would otherwise stay side by side after grouping
+            rules[rule] = list(dict.fromkeys(rules[rule]))
+            groups: Dict[str, List[Tuple[str, ...]]] = {}
+            for body in rules[rule]:
+                if body: groups.setdefault(body[0], []).append(body)
+            shared = next((group for group in groups.values() if len(group) > 1), None)
+            if shared is None:
+                i += 1
+                continue
+
+            prefix = shared[0]
+            for body in shared[1:]:
+                length = 0
+                while length < min(len(prefix), len(body)) and prefix[length] == body[length]: length += 1
+                prefix = prefix[:length]
+            tail = self.fresh_name(rule, used)
+            rules[tail] = [body[len(prefix):] for body in shared]
+            factored = []
+            for body in rules[rule]:
+                if not body or body[0] != prefix[0]: factored.append(body)
+                elif prefix + (tail,) not in factored: factored.append(prefix + (tail,))
+            rules[rule] = factored
+            order.insert(i + 1, tail)
+
+        return CFG(self.grammar_string(order, rules))
 
     def is_non_deterministic(self):
-        for rule in self.rules:
-            for i, body in enumerate(self.rules[rule]):
-                for j, other_body in enumerate(self.rules[rule]):
-                    if i == j: continue
-                    if self.body_first(body).intersection(self.body_first(other_body))-{"&"}:
-                        return True
+        for head in self.nonterminals:
+            seen = set()
+            for index in self.head_productions.get(head, []):
+                first = self.sequence_first(self.productions[index][1]) - {self.epsilon}
+                if seen.intersection(first): return True
+                seen.update(first)
         return False
 
     def ll1_parser_table(self):
         if not self.is_ll1(): raise ValueError("This grammar is not LL(1)")
         table = []
-        self.first_follow()
-        for rule in self.rules_order:
-            for body in self.rules[rule]:
-                first = self.body_first(body)
-                for symbol in first:
-                    if symbol == "&":
-                        for follow in self.follow[rule]:
-                            table.append([rule, follow, self.get_rule_id(rule, body)])
-                    else:
-                        table.append([rule, symbol, self.get_rule_id(rule, body)])
+        for index, (head, body) in enumerate(self.productions):
+            rule = self.symbols[head]
+            for symbol in self.sequence_first(body):
+                if symbol == self.epsilon:
+                    for follow in self.follow_ids[head]:
+                        table.append([rule, self.symbols[follow], index + 1])
+                else:
+                    table.append([rule, self.symbols[symbol], index + 1])
+        return table
+
+    def lr_parser_table(self, method: str="lalr") -> 'lr_table.LRTable':
+        table = lr_table.LRTable(self, method)
+        if table.conflicts: raise ValueError(f"This grammar is not {method.upper()}: {table.conflicts[0][2]} conflict in state {table.conflicts[0][0]} on {table.conflicts[0][1]}")
         return table
 
     def table_string(self, table:List[List[str]]):
-        order = lambda x: ord(x) if x.isalpha() else ord(x) + ord("z")
         table.sort(key=lambda x: x[2])
-        table.sort(key=lambda x: order(x[1]))
+        table.sort(key=lambda x: symbol_order(x[1]))
         table.sort(key=lambda x: x[0])
         
         states = f"{{{','.join(sorted(self.rules_order))}}}"
         initial_state = self.start
-        alphabet = f"{{{','.join(sorted(set([x[1] for x in table]), key=lambda x: order(x)))}}}"
+        alphabet = f"{{{','.join(sorted(set([x[1] for x in table]), key=symbol_order))}}}"
         transitions = "".join([f"[{state},{read},{reduce}]" for state, read, reduce in table])
         output = f"{states};{initial_state};{alphabet};{transitions}"
         return output
 
     def first_follow_string(self) -> str:
-        order = lambda x: ord(x) if x.isalpha() else ord(x) + ord("z")
-        first = '; '.join([f"First({rule}) = {{{', '.join(sorted(self.first[rule], key=lambda x: order(x)))}}}" for rule in self.rules_order])
-        follow = '; '.join([f"Follow({rule}) = {{{', '.join(sorted(self.follow[rule], key=lambda x: order(x)))}}}" for rule in self.rules_order])
+        first = '; '.join([f"First({rule}) = {{{', '.join(sorted(self.first[rule], key=symbol_order))}}}" for rule in self.rules_order])
+        follow = '; '.join([f"Follow({rule}) = {{{', '.join(sorted(self.follow[rule], key=symbol_order))}}}" for rule in self.rules_order])
         return f"{first}; {follow}"
     
     def __str__(self) -> str:
@@ -0,0 +1,123 @@
+import functools
+import threading
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+
+@dataclass
+class PhaseReport:
+    name: str
+    depth: int = 0
+    seconds: float = 0.0
+    # Pico de memória alocada durante a fase, acima do que já estava alocado no início (só com tracemalloc ativo)
+    peak_memory: int = None
+    counters: Dict[str, int] = field(default_factory=dict)
+    children: List['PhaseReport'] = field(default_factory=list)
+
+    def __str__(self) -> str:
+        memory = f"  peak {self.peak_memory / 1024:.1f} KiB" if self.peak_memory is not None else ""
+        counters = "".join(f"  {name}={value}" for name, value in self.counters.items())
+        line = f"{'  ' * self.depth}{self.name:<{32 - 2 * self.depth}}{self.seconds * 1000:>10.3f} ms{memory}{counters}"
+        return "\n".join([line] + [str(child) for child in self.children])
+
+# Funções chamadas com o PhaseReport de cada fase encerrada, sem nenhuma inscrita a instrumentação fica desligada
+listeners: List[Callable[[PhaseReport], None]] = []
+# Fases abertas na thread atual
+local = threading.local()
+
+def subscribe(listener: Callable[[PhaseReport], None]) -> None:
+    listeners.append(listener)
+
+def unsubscribe(listener: Callable[[PhaseReport], None]) -> None:
+    listeners.remove(listener)
+
+class Phase:
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def __enter__(self) -> PhaseReport:
+        stack = getattr(local, "stack", None)
+        if stack is None: stack = local.stack = []
+        self.stack = stack
+        self.report = PhaseReport(self.name, depth=len(stack))
+        if stack: stack[-1][0].children.append(self.report)
+        self.memory = tracemalloc.is_tracing()
+        if self.memory:
+            # O pico é reiniciado a cada fase, a fase externa guarda o maior pico visto antes da interna começar
+            current, peak = tracemalloc.get_traced_memory()
+            if stack: stack[-1][1][0] = max(stack[-1][1][0], peak)
+            tracemalloc.reset_peak()
+            self.start_memory = current
+        self.peak = [0]
+        stack.append((self.report, self.peak))
+        self.start = time.perf_counter()
+        return self.report
+
+    def __exit__(self, *exc) -> None:
+        self.report.seconds = time.perf_counter() - self.start
+        self.stack.pop()
+        if self.memory and tracemalloc.is_tracing():
+            peak = max(self.peak[0], tracemalloc.get_traced_memory()[1])
+            self.report.peak_memory = peak - self.start_memory
+            if self.stack: self.stack[-1][1][0] = max(self.stack[-1][1][0], peak)
+            tracemalloc.reset_peak()
+        for listener in list(listeners): listener(self.report)
+
+class NullPhase:
+    def __enter__(self) -> None: return None
+    def __exit__(self, *exc) -> None: return None
+
+NULL_PHASE = NullPhase()
+
+def phase(name: str):
+    '''Context manager que mede um trecho como uma fase, aninhada na fase aberta no momento.'''
+    if not listeners: return NULL_PHASE
+    return Phase(name)
+
+def instrumented(function):
+    '''Decorador que mede cada chamada da função como uma fase com o nome dela.'''
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        if not listeners: return function(*args, **kwargs)
+        with Phase(function.__name__):
+            return function(*args, **kwargs)
+    return wrapper
+
+def count(name: str, amount: int=1) -> None:
+    '''Soma amount ao contador name da fase aberta, não faz nada se não houver fase aberta.
+    amount é avaliado mesmo com a instrumentação desligada, valores caros de calcular devem ser protegidos por if listeners.'''
+    if not listeners: return
+    stack = getattr(local, "stack", None)
+    if not stack: return
+    counters = stack[-1][0].counters
+    counters[name] = counters.get(name, 0) + amount
+
+class profile:
+    '''Coleta as fases executadas dentro do bloco with.
+
+    with instrumentation.profile(memory=True) as report:
+        FDA(regex="(a|b)*a(a|b)(a|b)").minimal_equivalent()
+    print(report)
+    '''
+    def __init__(self, memory: bool=False) -> None:
+        self.memory = memory
+        self.phases: List[PhaseReport] = []
+        self.started_tracing = False
+
+    def collect(self, report: PhaseReport) -> None:
+        if report.depth == 0: self.phases.append(report)
+
+    def __enter__(self) -> 'profile':
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracing = True
+        subscribe(self.collect)
+        return self
+
+    def __exit__(self, *exc) -> None:
+        unsubscribe(self.collect)
+        if self.started_tracing: tracemalloc.stop()
+
+    def __str__(self) -> str:
+        return "\n".join(str(report) for report in self.phases)
@@ -0,0 +1,14 @@
+from fda import CFG
+
+input_1 = "E = E+T; E = T; T = T*F; T = F; F = (E); F = i;"
+input_2 = "S = SoA; S = A; A = AaB; A = B; B = nB; B = (S); B = t; B = f;"
+input_3 = "S = Aa; S = bAc; S = dc; S = bda; A = d;"
+
+# input_3 é LALR(1), mas não SLR
+
+inputs = [input_1, input_2, input_3]
+
+for input in inputs:
+    cfg = CFG(input)
+    print(cfg.lr_parser_table().table_string())
+    print()
@@ -0,0 +1,242 @@
+from typing import Dict, List, Tuple
+
+Lookaheads = Dict[Tuple[int, int], int]
+
+class LRTable:
+    '''SLR or LALR(1) table built over the LR(0) automaton of a grammar (fda.CFG).
+
+    Items are ints production * stride + dot and each state is keyed by the sorted tuple of its kernel items.
+    Terminal sets are bitmasks indexed by symbol id.
+    Actions: shift to state s is s << 1, reduce by production p is (p << 1) | 1, accept is the reduction by production 0 (S' -> S).
+    Production p > 0 is the rule of id p in the grammar.'''
+
+    def __init__(self, cfg, method: str="lalr") -> None:
+        if method not in ("slr", "lalr"): raise ValueError(f"Unknown LR method: {method}")
+        self.cfg = cfg
+        self.method = method
+        # S' is not part of the grammar symbol table
+        self.augmented_start: int = len(cfg.symbols)
+        self.productions: List[Tuple[int, Tuple[int, ...]]] = [(self.augmented_start, (cfg.symbol_ids[cfg.start],))] + cfg.productions
+        self.stride: int = max(len(body) for _, body in self.productions) + 1
+        self.kernels: List[Tuple[int, ...]] = []
+        self.transitions: List[Dict[int, int]] = []
+        self.reductions: List[List[int]] = []
+        self.action: List[Dict[int, int]] = []
+        self.goto: List[Dict[int, int]] = []
+        self.conflicts: List[Tuple[int, str, str]] = []
+        self.build_automaton()
+        self.build_tables(self.slr_lookaheads() if method == "slr" else self.lalr_lookaheads())
+
+    def leading_nonterminals(self) -> Dict[int, frozenset]:
+        '''For each nonterminal, the nonterminals whose initial items enter the closure when the dot is before it.'''
+        cfg = self.cfg
+        starts = {head: set() for head in cfg.nonterminals}
+        for head, body in cfg.productions:
+            if body and body[0] in cfg.nonterminals: starts[head].add(body[0])
+        leading = {}
+        for head in cfg.nonterminals:
+            reached = {head}
+            stack = [head]
+            while stack:
+                for other in starts[stack.pop()]:
+                    if other not in reached:
+                        reached.add(other)
+                        stack.append(other)
+            leading[head] = frozenset(reached)
+        return leading
+
+    def build_automaton(self) -> None:
+        cfg = self.cfg
+        stride = self.stride
+        head_items = {head: [(index + 1) * stride for index in cfg.head_productions.get(head, [])] for head in cfg.nonterminals}
+        leading = self.leading_nonterminals()
+
+        state_ids: Dict[Tuple[int, ...], int] = {(0,): 0}
+        self.kernels.append((0,))
+        state = 0
+        # Breadth-first: states are numbered in the order they are discovered
+        while state < len(self.kernels):
+            items = list(self.kernels[state])
+            heads = set()
+            for item in items:
+                production, dot = divmod(item, stride)
+                body = self.productions[production][1]
+                if dot < len(body) and body[dot] in cfg.nonterminals: heads.update(leading[body[dot]])
+            for head in heads: items.extend(head_items[head])
+
+            successors: Dict[int, List[int]] = {}
+            reductions = []
+            for item in items:
+                production, dot = divmod(item, stride)
+                body = self.productions[production][1]
+                if dot < len(body): successors.setdefault(body[dot], []).append(item + 1)
+                else: reductions.append(production)
+
+            transitions = {}
+            for symbol, kernel in successors.items():
+                kernel = tuple(sorted(kernel))
+                target = state_ids.get(kernel)
+                if target is None:
+                    target = state_ids[kernel] = len(self.kernels)
+                    self.kernels.append(kernel)
+                transitions[symbol] = target
+            self.transitions.append(transitions)
+            self.reductions.append(reductions)
+            state += 1
+
+    def symbols_mask(self, symbols) -> int:
+        mask = 0
+        for symbol in symbols: mask |= 1 << symbol
+        return mask
+
+    def slr_lookaheads(self) -> Lookaheads:
+        '''Reduce by A -> ω on every terminal of FOLLOW(A).'''
+        follow = {head: self.symbols_mask(symbols) for head, symbols in self.cfg.follow_ids.items()}
+        follow[self.augmented_start] = 1 << self.cfg.end
+        return {(state, production): follow[self.productions[production][0]]
+                for state, reductions in enumerate(self.reductions) for production in reductions}
+
+    def lalr_lookaheads(self) -> Lookaheads:
+        '''LALR(1) lookaheads by DeRemer and Pennello, using the reads, includes and lookback relations over the nonterminal transitions.'''
+        cfg = self.cfg
+        nonterminals = cfg.nonterminals
+        nullable = {head for head in nonterminals if cfg.epsilon in cfg.first_ids[head]}
+
+        nonterminal_transitions = [(state, symbol) for state, transitions in enumerate(self.transitions) for symbol in transitions if symbol in nonterminals]
+        index = {transition: i for i, transition in enumerate(nonterminal_transitions)}
+
+        # DR(p, A): terminals read right after the transition, reads: the nullable nonterminal transitions that follow it
+        direct_reads = []
+        reads = []
+        for state, symbol in nonterminal_transitions:
+            target = self.transitions[state][symbol]
+            mask = self.symbols_mask(other for other in self.transitions[target] if other not in nonterminals)
+            if state == 0 and symbol == cfg.symbol_ids[cfg.start]: mask |= 1 << cfg.end
+            direct_reads.append(mask)
+            reads.append([index[(target, other)] for other in self.transitions[target] if other in nullable])
+        read = self.digraph(reads, direct_reads)
+
+        # (p, A) includes (p', B) when B -> βAγ, γ is nullable and p' reaches p reading β
+        # (q, B -> ω) lookback (p', B) when p' reaches q reading ω
+        includes = [[] for _ in nonterminal_transitions]
+        lookback: Dict[Tuple[int, int], List[int]] = {}
+        for i, (start, head) in enumerate(nonterminal_transitions):
+            for production in cfg.head_productions.get(head, []):
+                body = self.productions[production + 1][1]
+                # body[nullable_from:] is the longest nullable suffix of the body
+                nullable_from = len(body)
+                while nullable_from and body[nullable_from - 1] in nullable: nullable_from -= 1
+                state = start
+                for position, symbol in enumerate(body):
+                    if symbol in nonterminals and position + 1 >= nullable_from:
+                        includes[index[(state, symbol)]].append(i)
+                    state = self.transitions[state][symbol]
+                lookback.setdefault((state, production + 1), []).append(i)
+        follow = self.digraph(includes, read)
+
+        lookaheads = {}
+        for state, reductions in enumerate(self.reductions):
+            for production in reductions:
+                mask = 1 << cfg.end if production == 0 else 0
+                for i in lookback.get((state, production), []): mask |= follow[i]
+                lookaheads[(state, production)] = mask
+        return lookaheads
+
+    @staticmethod
+    def digraph(relation: List[List[int]], base: List[int]) -> List[int]:
+        '''F(x) = base(x) ∪ F(y) for every x R y. Iterative version of the Digraph algorithm, nodes of the same cycle get the same set.'''
+        infinity = len(relation) + 1
+        depth = [0] * len(relation)
+        result = list(base)
+        stack: List[int] = []
+        for root in range(len(relation)):
+            if depth[root]: continue
+            stack.append(root)
+            depth[root] = len(stack)
+            work = [(root, depth[root], iter(relation[root]))]
+            while work:
+                node, node_depth, edges = work[-1]
+                for other in edges:
+                    if depth[other] == 0:
+                        stack.append(other)
+                        depth[other] = len(stack)
+                        work.append((other, depth[other], iter(relation[other])))
+                        break
+                    depth[node] = min(depth[node], depth[other])
+                    result[node] |= result[other]
+                else:
+                    work.pop()
+                    if depth[node] == node_depth:
+                        while True:
+                            top = stack.pop()
+                            depth[top] = infinity
+                            result[top] = result[node]
+                            if top == node: break
+                    if work:
+                        parent = work[-1][0]
+                        depth[parent] = min(depth[parent], depth[node])
+                        result[parent] |= result[node]
+        return result
+
+    def build_tables(self, lookaheads: Lookaheads) -> None:
+        nonterminals = self.cfg.nonterminals
+        for state, transitions in enumerate(self.transitions):
+            action = {symbol: target << 1 for symbol, target in transitions.items() if symbol not in nonterminals}
+            self.goto.append({symbol: target for symbol, target in transitions.items() if symbol in nonterminals})
+            for production in self.reductions[state]:
+                mask = lookaheads[(state, production)]
+                while mask:
+                    low = mask & -mask
+                    mask ^= low
+                    symbol = low.bit_length() - 1
+                    reduce = (production << 1) | 1
+                    if symbol not in action:
+                        action[symbol] = reduce
+                        continue
+                    kind = "shift/reduce" if action[symbol] & 1 == 0 else "reduce/reduce"
+                    self.conflicts.append((state, self.cfg.symbols[symbol], kind))
+            self.action.append(action)
+
+    def parse(self, tokens) -> List[int]:
+        '''Table-driven shift-reduce parser.
+        Takes a sequence of terminals (a string, for one character per symbol grammars) and returns the ids of the reduced rules, in order.'''
+        tokens = list(tokens) + ["$"]
+        position = 0
+        stack = [0]
+        output = []
+        while True:
+            token = tokens[position]
+            action = self.action[stack[-1]].get(self.cfg.symbol_ids.get(token))
+            if action is None: raise ValueError(f"Unexpected symbol {token} at position {position}")
+            if action & 1 == 0:
+                stack.append(action >> 1)
+                position += 1
+                continue
+            production = action >> 1
+            if production == 0: return output
+            head, body = self.productions[production]
+            if body: del stack[-len(body):]
+            stack.append(self.goto[stack[-1]][head])
+            output.append(production)
+
+    def accepts(self, tokens) -> bool:
+        try: self.parse(tokens)
+        except ValueError: return False
+        return True
+
+    def table_string(self) -> str:
+        symbols = self.cfg.symbols
+        entries = []
+        for state in range(len(self.action)):
+            for symbol, action in self.action[state].items():
+                if action == 1: entry = "acc"
+                elif action & 1: entry = f"r{action >> 1}"
+                else: entry = f"s{action >> 1}"
+                entries.append((state, symbols[symbol], entry))
+            for symbol, target in self.goto[state].items():
+                entries.append((state, symbols[symbol], str(target)))
+        entries.sort(key=lambda x: (x[0], x[1] in self.cfg.rules_order, x[1]))
+
+        states = f"{{{','.join(str(state) for state in range(len(self.action)))}}}"
+        transitions = "".join([f"[{state},{symbol},{entry}]" for state, symbol, entry in entries])
+        return f"{states};0;{transitions}"
@@ -0,0 +1,146 @@
+import asyncio
+import time
+from concurrent.futures import Executor
+from typing import AsyncIterable, Dict, List, Tuple, Union
+
+from fda import FDA
+from compiled_dfa import Buffer, CompiledDFA, compile_pattern
+
+def picklable(data: Buffer) -> Buffer:
+    '''memoryview não pode ser enviado a um ProcessPoolExecutor, é copiado para bytes.'''
+    return bytes(data) if isinstance(data, memoryview) else data
+
+class MatcherService:
+    '''Serviço asyncio que verifica se entradas são aceitas por autômatos registrados por nome.
+
+    Chamadas de match com entradas pequenas feitas na mesma iteração do event loop são agrupadas e executadas em uma única passada.
+    Um lote só é executado no próprio event loop enquanto soma até inline_budget bytes, lotes maiores e entradas a partir de
+    offload_threshold são executados no executor (o padrão do loop, de threads, se nenhum for passado), para não bloquear o event loop.
+    Um ProcessPoolExecutor evita disputar o GIL com o loop.'''
+
+    def __init__(self, executor: Executor=None, batch_size: int=256, offload_threshold: int=64 * 1024, inline_budget: int=16 * 1024) -> None:
+        self.automata: Dict[str, CompiledDFA] = {}
+        self.executor = executor
+        self.batch_size = batch_size
+        self.offload_threshold = offload_threshold
+        self.inline_budget = inline_budget
+        self.pending: List[Tuple[CompiledDFA, Buffer, asyncio.Future]] = []
+        self.pending_bytes = 0
+        self.flush_scheduled = False
+        self.started = time.perf_counter()
+        self.counters: Dict[str, float] = {"requests": 0, "bytes": 0, "batches": 0, "offloaded": 0, "total_latency": 0.0, "max_latency": 0.0}
+
+    def register(self, name: str, automaton: Union[CompiledDFA, FDA, str]) -> None:
+        '''Registra um autômato compilado, um FDA (determinizado se preciso) ou uma expressão regular.'''
+        if isinstance(automaton, str): automaton = compile_pattern(automaton)
+        elif isinstance(automaton, FDA): automaton = CompiledDFA.from_fda(automaton)
+        self.automata[name] = automaton
+
+    def unregister(self, name: str) -> None:
+        del self.automata[name]
+
+    async def match(self, name: str, data: Buffer) -> bool:
+        dfa = self.automata[name]
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        if len(data) >= self.offload_threshold:
+            self.counters["offloaded"] += 1
+            result = await loop.run_in_executor(self.executor, dfa.scan, picklable(data))
+        else:
+            future = loop.create_future()
+            self.pending.append((dfa, data, future))
+            self.pending_bytes += len(data)
+            if len(self.pending) >= self.batch_size or self.pending_bytes >= self.inline_budget: self.flush()
+            elif not self.flush_scheduled:
+                self.flush_scheduled = True
+                loop.call_soon(self.flush)
+            result = await future
+        self.record(len(data), start)
+        return result
+
+    def flush(self) -> None:
+        '''Executa as requisições pendentes, agrupadas por autômato, no event loop se couberem em inline_budget ou no executor.'''
+        self.flush_scheduled = False
+        pending, self.pending = self.pending, []
+        inline = self.pending_bytes <= self.inline_budget
+        self.pending_bytes = 0
+        if not pending: return
+        self.counters["batches"] += 1
+        groups: Dict[int, Tuple[CompiledDFA, List[Tuple[Buffer, asyncio.Future]]]] = {}
+        for dfa, data, future in pending:
+            groups.setdefault(id(dfa), (dfa, []))[1].append((data, future))
+        for dfa, requests in groups.values():
+            if not inline:
+                self.counters["offloaded"] += 1
+                # O executor pode recusar a tarefa (por exemplo, se já foi encerrado)
+                try: task = asyncio.get_running_loop().run_in_executor(self.executor, dfa.scan_many, [picklable(data) for data, _ in requests])
+                except Exception as exception:
+                    self.deliver(requests, exception=exception)
+                    continue
+                task.add_done_callback(lambda task, requests=requests: self.deliver(requests, task))
+                continue
+            try: results = dfa.scan_many([data for data, _ in requests])
+            except Exception as exception:
+                self.deliver(requests, exception=exception)
+                continue
+            self.deliver(requests, results=results)
+
+    @staticmethod
+    def deliver(requests: List[Tuple[Buffer, asyncio.Future]], task: asyncio.Future=None, results: List[bool]=None, exception: Exception=None) -> None:
+        '''Entrega a cada requisição o seu resultado, vindo de results ou de uma tarefa do executor.'''
+        if task is not None:
+            if task.cancelled(): exception = asyncio.CancelledError()
+            else: exception = task.exception()
+            if exception is None: results = task.result()
+        for i, (_, future) in enumerate(requests):
+            if future.done(): continue
+            if exception is not None: future.set_exception(exception)
+            else: future.set_result(results[i])
+
+    async def match_stream(self, name: str, stream, chunk_size: int=64 * 1024) -> bool:
+        '''Verifica uma entrada recebida aos pedaços, de um asyncio.StreamReader (ou qualquer objeto com um read assíncrono) ou de um iterável assíncrono de pedaços.'''
+        dfa = self.automata[name]
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        state = dfa.start
+        size = 0
+        async for chunk in self.chunks(stream, chunk_size):
+            size += len(chunk)
+            if state < 0: continue
+            if len(chunk) >= self.offload_threshold:
+                self.counters["offloaded"] += 1
+                state = await loop.run_in_executor(self.executor, dfa.advance, picklable(chunk), state)
+            else:
+                state = dfa.advance(chunk, state)
+                # Devolve o controle ao event loop entre os pedaços
+                await asyncio.sleep(0)
+        self.record(size, start)
+        return state >= 0 and dfa.finals[state] == 1
+
+    @staticmethod
+    async def chunks(stream, chunk_size: int) -> AsyncIterable[Buffer]:
+        if hasattr(stream, "read"):
+            while True:
+                chunk = await stream.read(chunk_size)
+                if not chunk: return
+                yield chunk
+        else:
+            async for chunk in stream: yield chunk
+
+    def record(self, size: int, start: float) -> None:
+        latency = time.perf_counter() - start
+        self.counters["requests"] += 1
+        self.counters["bytes"] += size
+        self.counters["total_latency"] += latency
+        self.counters["max_latency"] = max(self.counters["max_latency"], latency)
+
+    def stats(self) -> Dict[str, float]:
+        '''Contadores acumulados, vazão desde a criação do serviço e latências em segundos.'''
+        elapsed = time.perf_counter() - self.started
+        requests = self.counters["requests"]
+        return {
+            **self.counters,
+            "requests_per_second": requests / elapsed if elapsed else 0.0,
+            "bytes_per_second": self.counters["bytes"] / elapsed if elapsed else 0.0,
+            "mean_latency": self.counters["total_latency"] / requests if requests else 0.0,
+        }
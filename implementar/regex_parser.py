@@ -1,7 +1,5 @@
 from dataclasses import dataclass, field
-from typing import Set, List, Dict
-
-State = Set[str]
+from typing import List, Tuple
 
 @dataclass
 class Reader:
@@ -88,32 +86,15 @@ def parse_factor(reader: Reader):
 
 
 class RegexNode:
-    def __init__(self) -> None:
-        self.firstpos: State = set()
-        self.lastpos: State = set()
-    
-    def __str__(self) -> str:
-        pass
-
-    @property
-    def firstpos(self) -> State:
-        pass
+    # nullable, firstpos e lastpos são preenchidos por annotate, as posições são bitmasks indexados pelo número da folha
+    __slots__ = ("nullable", "firstpos", "lastpos")
 
-    @property
-    def lastpos(self) -> State:
-        pass
-
-    @property
-    def nullable(self) -> bool:
-        pass
-
-    def followpos(self, followpos_table: Dict[str, State]=None) -> Dict[str, State]:
-        pass
-
-    def name_leaves(self, leaf_counter=0):
+    def __str__(self) -> str:
         pass
 
 class CatRegexNode(RegexNode):
+    __slots__ = ("left", "right")
+
     def __init__(self, left: RegexNode=None, right: RegexNode=None):
         self.left: RegexNode = left
         self.right: RegexNode = right
@@ -121,136 +102,90 @@ class CatRegexNode(RegexNode):
     def __str__(self) -> str:
         return f"CatRegexNode(left={self.left}, right={self.right})"
 
-    @property
-    def firstpos(self) -> State:
-        return self.left.firstpos if not self.left.nullable else self.left.firstpos.union(self.right.firstpos)
-
-    @property
-    def lastpos(self) -> State:
-        return self.right.lastpos if not self.right.nullable else self.left.lastpos.union(self.right.lastpos)
-    
-    @property
-    def nullable(self) -> bool:
-        return self.left.nullable and self.right.nullable
-    
-    def followpos(self, followpos_table: Dict[str, State]=None) -> Dict[str, State]:
-        if followpos_table is None: followpos_table = {}
-        for i in self.left.lastpos:
-            followpos_table[i] = followpos_table[i].union(self.right.firstpos)
-        self.left.followpos(followpos_table)
-        self.right.followpos(followpos_table)
-        return followpos_table
-    
-    def name_leaves(self, leaf_counter=0, leaf_symbols=None):
-        if leaf_symbols is None: leaf_symbols = {}
-        leaf_counter, leaf_symbols = self.left.name_leaves(leaf_counter, leaf_symbols)
-        leaf_counter, leaf_symbols = self.right.name_leaves(leaf_counter, leaf_symbols)
-        return leaf_counter, leaf_symbols
-
 class OrRegexNode(RegexNode):
+    __slots__ = ("left", "right")
+
     def __init__(self, left: RegexNode=None, right: RegexNode=None):
         self.left: RegexNode = left
         self.right: RegexNode = right
     
     def __str__(self) -> str:
         return f"OrRegexNode(left={self.left}, right={self.right})"
-    
-    @property
-    def firstpos(self):
-        return self.left.firstpos.union(self.right.firstpos)
-
-    @property
-    def lastpos(self):
-        return self.left.lastpos.union(self.right.lastpos)
-    
-    @property
-    def nullable(self):
-        return self.left.nullable or self.right.nullable
-    
-    def followpos(self, followpos_table: Dict[str, State]=None) -> Dict[str, State]:
-        if followpos_table is None: followpos_table = {}
-        self.left.followpos(followpos_table)
-        self.right.followpos(followpos_table)
-        return followpos_table
-    
-    def name_leaves(self, leaf_counter=0, leaf_symbols=None):
-        if leaf_symbols is None: leaf_symbols = {}
-        leaf_counter, leaf_symbols = self.left.name_leaves(leaf_counter, leaf_symbols)
-        leaf_counter, leaf_symbols = self.right.name_leaves(leaf_counter, leaf_symbols)
-        return leaf_counter, leaf_symbols
 
 class StarRegexNode(RegexNode):
+    __slots__ = ("child",)
+
     def __init__(self, child: RegexNode=None):
         self.child: RegexNode = child
     
     def __str__(self) -> str:
         return f"StarRegexNode(child={self.child})"
-    
-    @property
-    def firstpos(self):
-        return self.child.firstpos
-    
-    @property
-    def lastpos(self):
-        return self.child.lastpos
-    
-    @property
-    def nullable(self):
-        return True
-
-    def followpos(self, followpos_table: Dict[str, State]=None) -> Dict[str, State]:
-        if followpos_table is None: followpos_table = {}
-        self.child.followpos(followpos_table)
-        for i in self.child.lastpos:
-            followpos_table[i] = followpos_table[i].union(self.child.firstpos)
-        return followpos_table
-    
-    def name_leaves(self, leaf_counter=0, leaf_symbols=None):
-        if leaf_symbols is None: leaf_symbols = {}
-        leaf_counter, leaf_symbols = self.child.name_leaves(leaf_counter, leaf_symbols)
-        return leaf_counter, leaf_symbols
 
 class LeafRegexNode(RegexNode):
-    def __init__(self, value: chr=None, leaf_number=0):
+    __slots__ = ("value", "leaf_number")
+
+    def __init__(self, value: chr=None, leaf_number: int=0):
         self.value: chr = value
-        self.leaf_number = leaf_number
+        self.leaf_number: int = leaf_number
     
     def __str__(self) -> str:
         return f"LeafRegexNode(value={self.value})"
-    
-    @property
-    def firstpos(self):
-        if self.value == "&": return set()
-        return {self.leaf_number}
-    
-    @property
-    def lastpos(self):
-        if self.value == "&": return set()
-        return {self.leaf_number}
-    
-    @property
-    def nullable(self):
-        return self.value == "&"
 
-    def followpos(self, followpos_table: Dict[str, State]=None) -> Dict[str, State]:
-        if followpos_table is None: followpos_table = {}
-        return followpos_table
-    
-    def name_leaves(self, leaf_counter=0, leaf_symbols=None):
-        if leaf_symbols is None: leaf_symbols = {}
-        if self.value == "&": return leaf_counter, leaf_symbols
-        leaf_counter += 1
-        self.leaf_number = str(leaf_counter)
-        leaf_symbols[str(leaf_counter)] = self.value
-        return leaf_counter, leaf_symbols
+
+def positions(mask: int):
+    '''Números das folhas presentes em um bitmask de posições, em ordem crescente.'''
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def annotate(root: RegexNode) -> Tuple[List[str], List[int]]:
+    '''Numera as folhas da esquerda para a direita a partir de 1 e calcula nullable, firstpos e lastpos de cada nó.
+    Retorna o símbolo e o followpos (bitmask) de cada folha, indexados pelo número dela (a posição 0 não é usada).
+    A árvore é percorrida em pós-ordem com uma pilha, já que a concatenação de n termos gera uma cadeia de n nós.'''
+    leaf_symbols: List[str] = [None]
+    followpos: List[int] = [0]
+    stack = [(root, False)]
+    while stack:
+        node, visited = stack.pop()
+        if isinstance(node, LeafRegexNode):
+            if node.value == "&":
+                node.nullable, node.firstpos, node.lastpos = True, 0, 0
+                continue
+            node.leaf_number = len(leaf_symbols)
+            leaf_symbols.append(node.value)
+            followpos.append(0)
+            node.nullable = False
+            node.firstpos = node.lastpos = 1 << node.leaf_number
+        elif not visited:
+            stack.append((node, True))
+            if isinstance(node, StarRegexNode):
+                stack.append((node.child, False))
+            else:
+                stack.append((node.right, False))
+                stack.append((node.left, False))
+        elif isinstance(node, CatRegexNode):
+            left, right = node.left, node.right
+            node.nullable = left.nullable and right.nullable
+            node.firstpos = left.firstpos | right.firstpos if left.nullable else left.firstpos
+            node.lastpos = left.lastpos | right.lastpos if right.nullable else right.lastpos
+            for i in positions(left.lastpos): followpos[i] |= right.firstpos
+        elif isinstance(node, OrRegexNode):
+            left, right = node.left, node.right
+            node.nullable = left.nullable or right.nullable
+            node.firstpos = left.firstpos | right.firstpos
+            node.lastpos = left.lastpos | right.lastpos
+        else:
+            child = node.child
+            node.nullable = True
+            node.firstpos, node.lastpos = child.firstpos, child.lastpos
+            for i in positions(child.lastpos): followpos[i] |= child.firstpos
+    return leaf_symbols, followpos
 
 
 if __name__ == "__main__":
     root = parse_regex("a(a*(bb*a)*)*|b(b*(aa*b)*)*")
     root = CatRegexNode(left=root, right=LeafRegexNode(value="#"))
-    leaf_counter, leaf_symbols = root.name_leaves()
-
-    followpos_table = {}
-    for i in range(1, leaf_counter+1): followpos_table[str(i)] = set()
-    
-    root.followpos(followpos_table)
+    leaf_symbols, followpos = annotate(root)
+    for i in range(1, len(leaf_symbols)):
+        print(i, leaf_symbols[i], sorted(positions(followpos[i])))